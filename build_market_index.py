@@ -0,0 +1,154 @@
+#!/usr/local/bin/python3
+
+""" Builds market indexes from the sample files of all tickers, to be used
+    as --market_sample_path instead of a downloaded ^GSPC.
+
+    The samples are arranged in a (month x ticker) matrix, and the monthly
+    return of each index is a reduction over a row of the matrix against the
+    previous row:
+    - equal weight: the average return of all tickers
+    - volume weight: the average return of all tickers, weighted by their
+      dollar volume (price * volume) of the previous month
+    Only tickers having samples in both months are counted, so tickers may
+    enter or leave the universe at any time.  The index price starts from
+    BASE_PRICE and compounds the monthly returns.  The index volume is
+    chain-linked the same way: it starts from the total volume of the first
+    month and changes by the ratio of the total volumes of the tickers
+    present in both months, so entries and exits do not move it.  Whenever
+    the chained volume is 0 or no ticker present in both months has any
+    volume, it is re-based on the total volume of the current month, so it
+    does not get stuck at 0.  Months without any return keep the price of
+    the previous month.
+
+    The output is in the same format as sample_data.py.
+"""
+
+import argparse
+import logging
+import utils
+
+BASE_PRICE = 100.0
+
+def next_month(ym):
+  y, m = ym.split('-')
+  y, m = int(y), int(m)
+  if m < 12: return '%04d-%02d' % (y, m+1)
+  return '%04d-%02d' % (y+1, 1)
+
+# Returns all months from min_month to max_month, in ascending order.
+def month_range(min_month, max_month):
+  months = [min_month]
+  while months[-1] < max_month:
+    months.append(next_month(months[-1]))
+  return months
+
+# Returns (months, prices, volumes), where prices[i][j] and volumes[i][j] are
+# the samples of month i and ticker j, or None if missing.
+def build_matrix(samples_list):
+  min_month, max_month = None, None
+  for samples in samples_list:
+    if len(samples) == 0: continue
+    if min_month is None or min(samples) < min_month: min_month = min(samples)
+    if max_month is None or max(samples) > max_month: max_month = max(samples)
+  assert min_month is not None, 'No samples'
+  months = month_range(min_month, max_month)
+  prices = [[None] * len(samples_list) for month in months]
+  volumes = [[None] * len(samples_list) for month in months]
+  month_index = dict()
+  for i in range(len(months)):
+    month_index[months[i]] = i
+  for j in range(len(samples_list)):
+    for month, (price, volume) in samples_list[j].items():
+      prices[month_index[month]][j] = price
+      volumes[month_index[month]][j] = volume
+  return months, prices, volumes
+
+# Returns (equal weight return, volume weight return) from the previous row
+# to the current row, either of which is None if there is nothing to average.
+def compute_returns(prev_prices, prev_volumes, prices):
+  rows = [(p / pp - 1.0, pp * pv)
+          for pp, pv, p in zip(prev_prices, prev_volumes, prices)
+          if pp is not None and p is not None and pp > 0]
+  if len(rows) == 0: return None, None
+  ew = sum([r for r, w in rows]) / len(rows)
+  total_weight = sum([w for r, w in rows])
+  if total_weight <= 0: return ew, None
+  vw = sum([r * w for r, w in rows]) / total_weight
+  return ew, vw
+
+# Returns the ratio of the total volumes of the current row over the previous
+# row, counting only tickers present in both, or None if there are none.
+def compute_volume_ratio(prev_volumes, volumes):
+  pairs = [(pv, v) for pv, v in zip(prev_volumes, volumes)
+           if pv is not None and v is not None]
+  prev_total = sum([pv for pv, v in pairs])
+  if prev_total <= 0: return None
+  return sum([v for pv, v in pairs]) / prev_total
+
+# Returns a pair of sample dicts (equal weight, volume weight), mapping date
+# to (price, volume) like utils.read_samples().
+def build_market_index(samples_list):
+  months, prices, volumes = build_matrix(samples_list)
+  volume = sum([v for v in volumes[0] if v is not None])
+  ew_price, vw_price = BASE_PRICE, BASE_PRICE
+  ew_samples = {months[0]: (ew_price, volume)}
+  vw_samples = {months[0]: (vw_price, volume)}
+  for i in range(1, len(months)):
+    ew, vw = compute_returns(prices[i-1], volumes[i-1], prices[i])
+    if ew is None:
+      logging.warning('No returns for %s' % months[i])
+    else: ew_price *= 1.0 + ew
+    if vw is not None: vw_price *= 1.0 + vw
+    ratio = compute_volume_ratio(volumes[i-1], volumes[i])
+    if volume > 0 and ratio is not None: volume *= ratio
+    else:
+      volume = sum([v for v in volumes[i] if v is not None])
+      logging.warning('Re-basing market volume at %s' % months[i])
+    ew_samples[months[i]] = (ew_price, volume)
+    vw_samples[months[i]] = (vw_price, volume)
+  return ew_samples, vw_samples
+
+def write_samples(samples, output_path):
+  with utils.open_file(output_path, 'w') as fp:
+    for date in sorted(samples.keys(), reverse=True):
+      price, volume = samples[date]
+      print('%s %.2f %.2f' % (date, volume, price), file=fp)
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--ticker_file', required=True)
+  parser.add_argument('--sample_dir', required=True)
+  parser.add_argument('--equal_weight_path')
+  parser.add_argument('--volume_weight_path')
+  parser.add_argument('--verbose', action='store_true')
+  args = parser.parse_args()
+
+  assert (args.equal_weight_path is not None
+          or args.volume_weight_path is not None)
+
+  utils.setup_logging(args.verbose)
+
+  # Tickers are listed one per line.
+  tickers = utils.read_tickers(args.ticker_file)
+  logging.info('Processing %d tickers' % len(tickers))
+
+  samples_list = []
+  for i in range(len(tickers)):
+    ticker = tickers[i]
+    assert ticker.find('^') == -1  # ^GSPC should not be in tickers.
+    logging.info('%d/%d: %s' % (i+1, len(tickers), ticker))
+    sample_path = utils.find_file('%s/%s.csv' % (args.sample_dir, ticker))
+    if sample_path is None:
+      logging.warning('Input file does not exist for %s' % ticker)
+      continue
+    samples_list.append(utils.read_samples(sample_path))
+
+  ew_samples, vw_samples = build_market_index(samples_list)
+  logging.info('Built market index for %d months' % len(ew_samples))
+  if args.equal_weight_path is not None:
+    write_samples(ew_samples, args.equal_weight_path)
+  if args.volume_weight_path is not None:
+    write_samples(vw_samples, args.volume_weight_path)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,122 @@
+#!/usr/local/bin/python3
+
+""" Computes cross-sectional features, which compare each ticker against all
+    the tickers of the same month.  For each key in --keys, eg, er12:
+    - er12_rank: rank of the value among all tickers, from 1 (lowest) to n
+      (highest), ties taking the average rank
+    - er12_pct: percentile of the rank, from 0 (lowest) to 1 (highest)
+    - er12_z: z-score of the value, ie, (value - mean) / stddev
+    where only tickers having the key for the month are counted.
+
+    The input is the output of compute_features.py.  The output has the same
+    format, with the cross-sectional features appended to each line, so it
+    can be used as --feature_dir for create_raw_training_data.py, eg:
+    2013-08 ... er12:0.2000 er12_rank:15.0000 er12_pct:0.7000 er12_z:0.4000
+"""
+
+import argparse
+import logging
+import utils
+from math import sqrt
+
+KEYS = 'er1,er3,er6,er12,ev1,ev3,ev6,ev12'
+
+# Returns a list of (suffix, values) for the cross section values.
+def compute_cross_section(values):
+  n = len(values)
+  ranks = utils.compute_ranks(values)
+  if n > 1: pcts = [(r - 1) / (n - 1) for r in ranks]
+  else: pcts = [0.5]
+  mean = sum(values) / n
+  std = sqrt(sum([(v - mean) ** 2 for v in values]) / n)
+  if std > 0: zs = [(v - mean) / std for v in values]
+  else: zs = [0.0] * n
+  return [('rank', ranks), ('pct', pcts), ('z', zs)]
+
+# Reads a feature file into a list of (date, line, values), where values maps
+# each key in keys to its value, if present.
+def read_features(file_path, keys):
+  rows = []
+  for line in utils.read_lines(file_path):
+    items = line.split(' ')
+    values = dict()
+    for i in range(1, len(items)):
+      k, v = items[i].split(':')
+      if k in keys: values[k] = float(v)
+    rows.append((items[0], line, values))
+  return rows
+
+# Takes a list of rows from read_features() per ticker, and returns a list of
+# cross-sectional feature items per ticker, aligned with the rows.
+def compute_cross_sectional_features(rows_list, keys):
+  items_list = [[[] for row in rows] for rows in rows_list]
+  # Group (ticker, row) pairs by date for a date-major pass.
+  groups = dict()
+  for i in range(len(rows_list)):
+    rows = rows_list[i]
+    for j in range(len(rows)):
+      groups.setdefault(rows[j][0], []).append((i, j))
+  for date in sorted(groups.keys()):
+    group = groups[date]
+    for key in keys:
+      members = [(i, j) for i, j in group if key in rows_list[i][j][2]]
+      if len(members) == 0: continue
+      values = [rows_list[i][j][2][key] for i, j in members]
+      for suffix, results in compute_cross_section(values):
+        for k in range(len(members)):
+          i, j = members[k]
+          items_list[i][j].append('%s_%s:%.4f' % (key, suffix, results[k]))
+  return items_list
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--ticker_file', required=True)
+  parser.add_argument('--feature_dir', required=True)
+  parser.add_argument('--output_dir', required=True)
+  parser.add_argument('--keys', default=KEYS)
+  parser.add_argument('--overwrite', action='store_true')
+  parser.add_argument('--compression', default='none',
+                      choices=utils.COMPRESSIONS)
+  parser.add_argument('--verbose', action='store_true')
+  args = parser.parse_args()
+
+  # Sanity check.
+  assert args.feature_dir != args.output_dir
+
+  utils.setup_logging(args.verbose)
+  keys = args.keys.split(',')
+
+  # Tickers are listed one per line.
+  tickers = utils.read_tickers(args.ticker_file)
+  logging.info('Processing %d tickers' % len(tickers))
+
+  # All tickers must be loaded before any output can be computed.
+  loaded_tickers, rows_list = [], []
+  for i in range(len(tickers)):
+    ticker = tickers[i]
+    assert ticker.find('^') == -1  # ^GSPC should not be in tickers.
+    logging.info('%d/%d: %s' % (i+1, len(tickers), ticker))
+    feature_path = utils.find_file('%s/%s.txt' % (args.feature_dir, ticker))
+    if feature_path is None:
+      logging.warning('Input file does not exist for %s' % ticker)
+      continue
+    loaded_tickers.append(ticker)
+    rows_list.append(read_features(feature_path, keys))
+
+  logging.info('Computing cross-sectional features')
+  items_list = compute_cross_sectional_features(rows_list, keys)
+
+  for i in range(len(loaded_tickers)):
+    ticker = loaded_tickers[i]
+    output_path = utils.prepare_output(
+        '%s/%s.txt' % (args.output_dir, ticker), args.compression,
+        args.overwrite)
+    if output_path is None: continue
+    with utils.open_file(output_path, 'w') as fp:
+      rows, items = rows_list[i], items_list[i]
+      for j in range(len(rows)):
+        if len(items[j]) == 0: print(rows[j][1], file=fp)
+        else: print('%s %s' % (rows[j][1], ' '.join(items[j])), file=fp)
+
+if __name__ == '__main__':
+  main()
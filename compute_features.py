@@ -29,7 +29,6 @@
 import argparse
 import logging
 import utils
-from os import path
 
 ER_MONTHS = '1,2,3,6,9,12,15,18,21,24,27,30,33,36,39,42,45,48'
 EV_MONTHS = '1,2,3,6,9,12,15,18,21,24,27,30,33,36,39,42,45,48'
@@ -50,12 +49,13 @@ def compute_date(current_date, delta):
     m += 12
   return '%04d-%02d' % (y, m)
 
-def compute_features(stock_samples, market_samples, er_months, ev_months,
-                     output_path):
-  lines = []
+# Returns a dict mapping each date of stock_samples to a dict of features,
+# with the same precision as the feature files.
+def compute_feature_map(stock_samples, market_samples, er_months, ev_months):
+  feature_map = dict()
   for date_to in sorted(stock_samples.keys(), reverse=True):
     assert date_to in market_samples
-    items = []
+    items = dict()
     for m in er_months:
       date_from = compute_date(date_to, m)
       if date_from not in stock_samples:
@@ -66,7 +66,7 @@ def compute_features(stock_samples, market_samples, er_months, ev_months,
                                market_samples[date_from][0],
                                market_samples[date_to][0],
                                PRICE_BONUS)
-      items.append('er%d:%.4f' % (m, v))
+      items['er%d' % m] = round(v, 4)
     for m in ev_months:
       date_from = compute_date(date_to, m)
       if date_from not in stock_samples:
@@ -77,25 +77,27 @@ def compute_features(stock_samples, market_samples, er_months, ev_months,
                                market_samples[date_from][1],
                                market_samples[date_to][1],
                                VOLUME_BONUS)
-      items.append('ev%d:%.4f' % (m, v))
-    if len(items) == 0:
-      lines.append(date_to)
-    else:
-      lines.append('%s %s' % (date_to, ' '.join(items)))
+      items['ev%d' % m] = round(v, 4)
+    feature_map[date_to] = items
+  return feature_map
 
-  with open(output_path, 'w') as fp:
-    for line in lines:
-      print(line, file=fp)
+def compute_features(stock_samples, market_samples, er_months, ev_months,
+                     output_path):
+  utils.write_data(compute_feature_map(stock_samples, market_samples,
+                                       er_months, ev_months), output_path)
 
 def main():
   parser = argparse.ArgumentParser()
   parser.add_argument('--ticker_file', required=True)
+  parser.add_argument('--shard', default='0/1')
   parser.add_argument('--sample_dir', required=True)
   parser.add_argument('--market_sample_path', required=True)
   parser.add_argument('--output_dir', required=True)
   parser.add_argument('--er_months', default=ER_MONTHS)
   parser.add_argument('--ev_months', default=EV_MONTHS)
   parser.add_argument('--overwrite', action='store_true')
+  parser.add_argument('--compression', default='none',
+                      choices=utils.COMPRESSIONS)
   parser.add_argument('--verbose', action='store_true')
   args = parser.parse_args()
 
@@ -106,23 +108,21 @@ def main():
   ev_months = [int(m) for m in args.ev_months.split(',')]
 
   # Tickers are listed one per line.
-  with open(args.ticker_file, 'r') as fp:
-    tickers = fp.read().splitlines()
+  tickers = utils.read_tickers(args.ticker_file, utils.parse_shard(args.shard))
   logging.info('Processing %d tickers' % len(tickers))
 
   for i in range(len(tickers)):
     ticker = tickers[i]
     assert ticker.find('^') == -1  # ^GSPC should not be in tickers.
     logging.info('%d/%d: %s' % (i+1, len(tickers), ticker))
-    stock_sample_path = '%s/%s.csv' % (args.sample_dir, ticker)
-    if not path.isfile(stock_sample_path):
-      logging.warning('Input file does not exist: %s' % stock_sample_path)
+    stock_sample_path = utils.find_file('%s/%s.csv' % (args.sample_dir, ticker))
+    if stock_sample_path is None:
+      logging.warning('Input file does not exist for %s' % ticker)
       continue
     # The output format is no longer csv.  Use txt instead.
-    output_path = '%s/%s.txt' % (args.output_dir, ticker)
-    if path.isfile(output_path) and not args.overwrite:
-      logging.warning('Output file exists: %s, skipping' % output_path)
-      continue
+    output_path = utils.prepare_output('%s/%s.txt' % (args.output_dir, ticker),
+                                       args.compression, args.overwrite)
+    if output_path is None: continue
     stock_samples = utils.read_samples(stock_sample_path)
     compute_features(stock_samples, market_samples, er_months, ev_months,
                      output_path)
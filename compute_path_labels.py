@@ -0,0 +1,177 @@
+#!/usr/local/bin/python3
+
+""" Computes path-dependent labels from the daily prices over the next n
+    months, as opposed to compute_labels.py which only looks at the prices at
+    both ends.  Each month is started from its first trading day (the one
+    sampled by sample_data.py), and the path covers the trading days after
+    it up to the first trading day n months later.  --label_type is one of:
+    - drawdown: the largest loss from the start price along the path
+      (between -100% and 0)
+    - runup: the largest gain from the start price along the path
+      (between 0 and 100%, capped like other returns)
+    - barrier: +1 if the price gains --up before it loses --down along the
+      path, -1 if it loses --down first, and 0 if neither happens
+    Gains/losses are calculated with a bonus of 0.01 like compute_labels.py,
+    and are not relative to the market.
+
+    The output has the same format as compute_labels.py (eg, 2013-08 1:-0.05
+    3:-0.12), so it can be used as --label_dir for create_raw_training_data.py.
+    Each label type should be written to its own output directory.
+
+    The extrema of all paths are computed with monotonic deques, which take
+    O(number of days) per ticker and horizon regardless of the path lengths.
+"""
+
+import argparse
+import compute_labels
+import logging
+import utils
+from collections import deque
+
+MONTHS = compute_labels.MONTHS
+PRICE_BONUS = compute_labels.PRICE_BONUS
+LABEL_TYPES = ['drawdown', 'runup', 'barrier']
+UP = 0.1
+DOWN = 0.1
+
+# Returns a list of (date, adjusted close) of the price file lines (including
+# the header), in ascending order of dates.
+def read_prices(lines):
+  prices = []
+  header = True
+  for line in lines:
+    if header:
+      header = False
+      continue
+    if line.startswith('#'):
+      logging.warning('Skipping line: %s' % line)
+      continue
+    d, o, h, l, c, v, a = line.split(',')
+    prices.append((d, float(a)))
+  prices.reverse()
+  return prices
+
+# Returns a dict mapping each yyyy-mm of prices to the index of its first
+# trading day.
+def find_month_starts(prices):
+  month_starts = dict()
+  for i in range(len(prices)):
+    month = prices[i][0][:7]
+    if month not in month_starts: month_starts[month] = i
+  return month_starts
+
+# Takes a list of windows (first, last) with non-decreasing firsts and lasts,
+# and returns the (min, max) of values[first:last+1] for each window.
+def window_extrema(values, windows):
+  minq, maxq = deque(), deque()
+  extrema = []
+  j = 0
+  for first, last in windows:
+    assert first <= last
+    while j <= last:
+      while len(minq) > 0 and values[minq[-1]] >= values[j]: minq.pop()
+      minq.append(j)
+      while len(maxq) > 0 and values[maxq[-1]] <= values[j]: maxq.pop()
+      maxq.append(j)
+      j += 1
+    while minq[0] < first: minq.popleft()
+    while maxq[0] < first: maxq.popleft()
+    extrema.append((values[minq[0]], values[maxq[0]]))
+  return extrema
+
+def compute_return(price_from, price_to):
+  return (price_to - price_from) / (price_from + PRICE_BONUS)
+
+# Returns +1 if the path of values[first:last+1] from start gains up before
+# losing down, -1 if the other way around, and 0 if neither happens.
+# lowest and highest are the extrema of the path.
+def compute_barrier(values, start, first, last, lowest, highest, up, down):
+  hit_up = compute_return(values[start], highest) >= up
+  hit_down = compute_return(values[start], lowest) <= -down
+  if not hit_up and not hit_down: return 0
+  if not hit_down: return 1
+  if not hit_up: return -1
+  # Both are hit; scan for the first one.
+  for i in range(first, last+1):
+    r = compute_return(values[start], values[i])
+    if r >= up: return 1
+    if r <= -down: return -1
+  assert False, 'Barrier not found'
+
+# Returns a dict mapping each month of prices to a dict of labels keyed by
+# months, with the same precision as the label files.
+def compute_path_label_map(prices, months, label_type, up=UP, down=DOWN):
+  assert label_type in LABEL_TYPES
+  values = [price for date, price in prices]
+  month_starts = find_month_starts(prices)
+  label_map = dict()
+  for date in month_starts: label_map[date] = dict()
+  for m in months:
+    assert m > 0
+    dates, windows = [], []
+    for date_from in sorted(month_starts.keys()):
+      date_to = compute_labels.compute_date(date_from, m)
+      if date_to not in month_starts: continue
+      dates.append(date_from)
+      windows.append((month_starts[date_from] + 1, month_starts[date_to]))
+    extrema = window_extrema(values, windows)
+    for i in range(len(dates)):
+      start = month_starts[dates[i]]
+      lowest, highest = extrema[i]
+      if label_type == 'drawdown':
+        v = min(0.0, max(utils.MIN_CAP, compute_return(values[start],
+                                                       lowest)))
+      elif label_type == 'runup':
+        v = max(0.0, min(utils.MAX_CAP, compute_return(values[start],
+                                                       highest)))
+      else:
+        v = compute_barrier(values, start, windows[i][0], windows[i][1],
+                            lowest, highest, up, down)
+      label_map[dates[i]]['%d' % m] = round(v, 4)
+  return label_map
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--ticker_file', required=True)
+  parser.add_argument('--shard', default='0/1')
+  parser.add_argument('--price_dir', required=True)
+  parser.add_argument('--output_dir', required=True)
+  parser.add_argument('--label_type', required=True, choices=LABEL_TYPES)
+  parser.add_argument('--months', default=MONTHS)
+  parser.add_argument('--up', default=UP, type=float)
+  parser.add_argument('--down', default=DOWN, type=float)
+  parser.add_argument('--overwrite', action='store_true')
+  parser.add_argument('--compression', default='none',
+                      choices=utils.COMPRESSIONS)
+  parser.add_argument('--verbose', action='store_true')
+  args = parser.parse_args()
+
+  # Sanity check.
+  assert args.price_dir != args.output_dir
+  assert args.up > 0 and args.down > 0
+
+  utils.setup_logging(args.verbose)
+  months = [int(m) for m in args.months.split(',')]
+
+  # Tickers are listed one per line.
+  tickers = utils.read_tickers(args.ticker_file, utils.parse_shard(args.shard))
+  logging.info('Processing %d tickers' % len(tickers))
+
+  for i in range(len(tickers)):
+    ticker = tickers[i]
+    assert ticker.find('^') == -1  # ^GSPC should not be in tickers.
+    logging.info('%d/%d: %s' % (i+1, len(tickers), ticker))
+    price_path = utils.find_file('%s/%s.csv' % (args.price_dir, ticker))
+    if price_path is None:
+      logging.warning('Input file does not exist for %s' % ticker)
+      continue
+    output_path = utils.prepare_output('%s/%s.txt' % (args.output_dir, ticker),
+                                       args.compression, args.overwrite)
+    if output_path is None: continue
+    prices = read_prices(utils.read_lines(price_path))
+    utils.write_data(compute_path_label_map(prices, months, args.label_type,
+                                            args.up, args.down),
+                     output_path)
+
+if __name__ == '__main__':
+  main()
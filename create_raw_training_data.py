@@ -4,6 +4,21 @@
     libsvm input, except that each line is prefixed by ticker and date, to
     make it easier to track back the training data.
 
+    Multiple datasets can be created in one pass over the tickers by listing
+    them in --dataset_file, one dataset per line, eg:
+    output_path=/tmp/raw_1 label=1 regression
+    output_path=/tmp/raw_3 label=3 features=er1,er3,ev1,ev3 min_date=2000-01
+    output_path=/tmp/raw_6 label=6 classification
+    Keys that are not specified take the defaults of the corresponding flags.
+    'regression' and 'classification' (or regression=1/0) override
+    --regression in either direction.
+    Each feature/label file is read only once and shared by all datasets.
+    Output paths ending with .gz, .xz or .bz2 are compressed accordingly.
+
+    With --shard=i/n, only the i-th range of tickers is processed and each
+    output is written to utils.shard_path() of its output path, eg,
+    /tmp/raw_1.0-of-4.  Use merge_raw_training_data.py to combine the shards.
+
     NOTE: --regression should always be specified for downstream splitting
     script to work.  This flag should be removed.
 """
@@ -11,7 +26,6 @@
 import argparse
 import logging
 import utils
-from os import path
 
 FEATURES = ('er1,er2,er3,er6,er9,er12,er15,er18,er21,er24'
             ',ev1,ev2,ev3,ev6,ev9,ev12,ev15,ev18,ev21,ev24')
@@ -19,11 +33,9 @@ LABEL = '1'
 MIN_DATE = '0000-00'
 MAX_DATE = '9999-99'
 
-def read_data(file_path, min_date, max_date):
-  with open(file_path, 'r') as fp:
-    lines = fp.read().splitlines()
+def read_data(file_path, min_date=MIN_DATE, max_date=MAX_DATE):
   d = dict()
-  for line in lines:
+  for line in utils.read_lines(file_path):
     items = line.split(' ')
     assert len(items) > 0
     date = items[0]
@@ -35,12 +47,41 @@ def read_data(file_path, min_date, max_date):
     d[date] = dd
   return d
 
-def create_raw_training_data(ticker, feature_path, label_path, features, label,
-                             min_date, max_date, regression, fp):
-  feature_map = read_data(feature_path, min_date, max_date)
-  label_map = read_data(label_path, min_date, max_date)
-  count = 0
+# Parses one line of --dataset_file into a dataset dict.  Unspecified keys
+# fall back to the values in defaults.
+def parse_dataset(line, defaults):
+  dataset = dict(defaults)
+  for item in line.split():
+    if item in ('regression', 'classification'):
+      dataset['regression'] = item == 'regression'
+      continue
+    k, v = item.split('=', 1)
+    if k == 'regression':
+      assert v in ('0', '1'), 'Bad regression value: %s' % v
+      dataset['regression'] = v == '1'
+      continue
+    assert k in ('output_path', 'features', 'label', 'min_date',
+                 'max_date'), 'Unknown dataset key: %s' % k
+    dataset[k] = v
+  assert dataset.get('output_path'), 'output_path is required: %s' % line
+  if isinstance(dataset['features'], str):
+    dataset['features'] = dataset['features'].split(',')
+  return dataset
+
+def read_datasets(file_path, defaults):
+  datasets = []
+  for line in utils.read_lines(file_path):
+    if line.strip() == '' or line.startswith('#'): continue
+    datasets.append(parse_dataset(line, defaults))
+  return datasets
+
+# Yields a row of (ticker, date, label, values) for each date in the range
+# having the label and all the features, in descending order of dates, where
+# values are the features in the order of features.
+def generate_rows(ticker, feature_map, label_map, features, label, min_date,
+                  max_date):
   for d in sorted(feature_map.keys() & label_map.keys(), reverse=True):
+    if d < min_date or d > max_date: continue
     if label not in label_map[d]: continue
     ok = True
     for f in features:
@@ -48,19 +89,46 @@ def create_raw_training_data(ticker, feature_path, label_path, features, label,
         ok = False
         break
     if not ok: continue
-    items = [ticker, d, utils.make_label(label_map[d][label], regression)]
-    for i in range(len(features)):
-      items.append('%d:%f' % (i+1, feature_map[d][features[i]]))
-    print(' '.join(items), file=fp)
+    yield ticker, d, label_map[d][label], [feature_map[d][f] for f in features]
+
+def format_row(row, regression):
+  ticker, date, label, values = row
+  items = [ticker, date, utils.make_label(label, regression)]
+  return ' '.join(items + utils.format_values(values))
+
+def write_data(ticker, feature_map, label_map, features, label, min_date,
+               max_date, regression, fp):
+  count = 0
+  for row in generate_rows(ticker, feature_map, label_map, features, label,
+                           min_date, max_date):
+    print(format_row(row, regression), file=fp)
     count += 1
-  logging.info('%d data points' % count)
+  return count
+
+# Writes every dataset in datasets, each to its own fp, from a single read of
+# the feature and label files.
+def create_raw_training_datasets(ticker, feature_path, label_path, datasets,
+                                 fps):
+  assert len(datasets) == len(fps)
+  min_date = min([dataset['min_date'] for dataset in datasets])
+  max_date = max([dataset['max_date'] for dataset in datasets])
+  feature_map = read_data(feature_path, min_date, max_date)
+  label_map = read_data(label_path, min_date, max_date)
+  for i in range(len(datasets)):
+    dataset = datasets[i]
+    count = write_data(ticker, feature_map, label_map, dataset['features'],
+                       dataset['label'], dataset['min_date'],
+                       dataset['max_date'], dataset['regression'], fps[i])
+    logging.info('%d data points for dataset %d' % (count, i+1))
 
 def main():
   parser = argparse.ArgumentParser()
   parser.add_argument('--ticker_file', required=True)
+  parser.add_argument('--shard', default='0/1')
   parser.add_argument('--feature_dir', required=True)
   parser.add_argument('--label_dir', required=True)
-  parser.add_argument('--output_path', required=True)
+  parser.add_argument('--output_path')
+  parser.add_argument('--dataset_file')
   parser.add_argument('--regression', action='store_true')
   parser.add_argument('--features', default=FEATURES)
   parser.add_argument('--label', default=LABEL)
@@ -69,31 +137,50 @@ def main():
   parser.add_argument('--verbose', action='store_true')
   args = parser.parse_args()
 
+  # Exactly one of --output_path and --dataset_file must be specified.
+  assert (args.output_path is None) != (args.dataset_file is None)
+
   utils.setup_logging(args.verbose)
+  shard = utils.parse_shard(args.shard)
+
+  defaults = {
+      'output_path': args.output_path,
+      'features': args.features.split(','),
+      'label': args.label,
+      'min_date': args.min_date,
+      'max_date': args.max_date,
+      'regression': args.regression,
+  }
+  if args.dataset_file is None:
+    datasets = [defaults]
+  else:
+    datasets = read_datasets(args.dataset_file, defaults)
+  assert len(datasets) > 0
+  output_paths = [utils.shard_path(dataset['output_path'], shard)
+                  for dataset in datasets]
+  assert len(set(output_paths)) == len(output_paths)
+  logging.info('Creating %d datasets' % len(datasets))
 
   # Tickers are listed one per line.
-  with open(args.ticker_file, 'r') as fp:
-    tickers = fp.read().splitlines()
+  tickers = utils.read_tickers(args.ticker_file, shard)
   logging.info('Processing %d tickers' % len(tickers))
 
-  fp = open(args.output_path, 'w')
+  fps = [utils.open_file(output_path, 'w') for output_path in output_paths]
   for i in range(len(tickers)):
     ticker = tickers[i]
     assert ticker.find('^') == -1  # ^GSPC should not be in tickers.
     logging.info('%d/%d: %s' % (i+1, len(tickers), ticker))
 
-    feature_path = '%s/%s.txt' % (args.feature_dir, ticker)
-    label_path = '%s/%s.txt' % (args.label_dir, ticker)
-    has_input = path.isfile(feature_path)
-    assert has_input == path.isfile(label_path)
+    feature_path = utils.find_file('%s/%s.txt' % (args.feature_dir, ticker))
+    label_path = utils.find_file('%s/%s.txt' % (args.label_dir, ticker))
+    has_input = feature_path is not None
+    assert has_input == (label_path is not None)
     if not has_input:
       logging.warning('Input files do not exist for %s' % ticker)
       continue
-    create_raw_training_data(ticker, feature_path, label_path,
-                             args.features.split(','), args.label,
-                             args.min_date, args.max_date, args.regression, fp)
-  fp.close()
+    create_raw_training_datasets(ticker, feature_path, label_path, datasets,
+                                 fps)
+  for fp in fps: fp.close()
 
 if __name__ == '__main__':
   main()
-
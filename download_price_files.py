@@ -7,6 +7,7 @@ import argparse
 import logging
 import utils
 from os import path, remove, system
+from shutil import copyfileobj
 
 WGET = '/usr/local/bin/wget'
 
@@ -21,19 +22,28 @@ def download(ticker, output_path):
     return False
   return True
 
+# Replaces input_path by its compressed copy at output_path.
+def compress(input_path, output_path):
+  with open(input_path, 'r') as ifp:
+    with utils.open_file(output_path, 'w') as ofp:
+      copyfileobj(ifp, ofp)
+  remove(input_path)
+
 def main():
   parser = argparse.ArgumentParser()
   parser.add_argument('--ticker_file', required=True)
+  parser.add_argument('--shard', default='0/1')
   parser.add_argument('--output_dir', required=True)
   parser.add_argument('--overwrite', action='store_true')
+  parser.add_argument('--compression', default='none',
+                      choices=utils.COMPRESSIONS)
   parser.add_argument('--verbose', action='store_true')
   args = parser.parse_args()
 
   utils.setup_logging(args.verbose)
 
   # Tickers are listed one per line.
-  with open(args.ticker_file, 'r') as fp:
-    tickers = fp.read().splitlines()
+  tickers = utils.read_tickers(args.ticker_file, utils.parse_shard(args.shard))
   logging.info('Processing %d tickers' % len(tickers))
 
   sl, fl = [], []  # Lists of tickers succeeded/failed to download.
@@ -42,19 +52,24 @@ def main():
     logging.info('%d/%d: %s' % (i+1, len(tickers), ticker))
 
     output_path = '%s/%s.csv' % (args.output_dir, ticker.replace('^', '_'))
+    existing_path = utils.find_file(output_path)
     dl = False
-    if path.isfile(output_path):
+    if existing_path is not None:
       action = 'skipping'
       if args.overwrite:
-        remove(output_path)
+        remove(existing_path)
         action = 'overwriting'
         dl = True
-      logging.warning('Output file exists: %s, %s' % (output_path, action))
+      logging.warning('Output file exists: %s, %s' % (existing_path, action))
     else: dl = True
 
     if dl:
       ok = download(ticker, output_path)
-      if ok: sl.append(ticker)
+      if ok:
+        if args.compression != 'none':
+          compress(output_path,
+                   utils.compressed_path(output_path, args.compression))
+        sl.append(ticker)
       else: fl.append(ticker)
   logging.info('Downloaded %d tickers, failed %d tickers'
                % (len(sl), len(fl)))
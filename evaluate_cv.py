@@ -0,0 +1,213 @@
+#!/usr/local/bin/python3
+
+""" Evaluates predictions on the test data of split_data_for_cv.py.
+
+    For each fold k, the predictions are read from
+    <prediction_dir>/test_prediction_<k>, one per line of test_data_<k>, in
+    the output format of svm-predict (with or without -b 1; with -b 1 the
+    probability of label 1 is used as score).  Each prediction is joined
+    with the date and ticker of test_index_<k> and the real excess return of
+    --raw_data_path (which should be the --input_path of split_data_for_cv.py).
+
+    The joined rows of all folds are grouped by month.  For each month, the
+    top and bottom --quantile of tickers by score form a long and a short
+    portfolio of equal weights.  Tickers tied in score at the boundary of a
+    portfolio share its remaining weight equally, so plain +1/-1 predictions
+    put all tickers of the same label in or out together.  The following are
+    computed:
+    - long/short: average return of the long/short portfolio
+    - long_short: long - short
+    - cum_long_short: long_short compounded over all months so far
+    - hit: fraction of the long (short) positions with positive (negative)
+      returns
+    - ic: information coefficient, ie, rank correlation of score and return
+    Monthly results are written to --output_path, one month per line, eg:
+    2013-08 n:18 long:0.0213 short:-0.0102 long_short:0.0315 ...
+    Summaries over all months and over each fold are logged.
+
+    NOTE: cum_long_short only makes sense if the label of the raw data is the
+    excess return of the next month.
+
+    NOTE: folds are split by entries rather than months, so the month at the
+    boundary of two folds has predictions of both models in the 'All folds'
+    results.
+"""
+
+import argparse
+import logging
+import utils
+from math import sqrt
+
+QUANTILE = 0.1
+
+# Returns the scores of a svm-predict output file.
+def read_predictions(file_path):
+  lines = utils.read_lines(file_path)
+  first = next(lines, None)
+  if first is None: return []
+  scores = []
+  if first.startswith('labels '):
+    # With -b 1, the first line lists the labels of the probability columns.
+    labels = first.split(' ')[1:]
+    if '1' in labels: column = labels.index('1') + 1
+    else: column = labels.index('+1') + 1
+  else:
+    column = 0
+    scores.append(float(first.split(' ')[0]))
+  for line in lines:
+    scores.append(float(line.split(' ')[column]))
+  return scores
+
+# Returns a dict mapping (date, ticker) to the label of raw training data.
+def read_returns(file_path):
+  returns = dict()
+  for line in utils.read_lines(file_path):
+    items = line.split(' ', 3)
+    returns[(items[1], items[0])] = float(items[2])
+  return returns
+
+# Returns a list of (date, score, return) for fold k.
+def read_fold(cv_dir, prediction_dir, k, returns):
+  index_path = utils.find_file('%s/test_index_%d' % (cv_dir, k))
+  prediction_path = utils.find_file('%s/test_prediction_%d'
+                                    % (prediction_dir, k))
+  assert index_path is not None, 'Missing test index for fold %d' % k
+  assert prediction_path is not None, 'Missing predictions for fold %d' % k
+  scores = read_predictions(prediction_path)
+  rows = []
+  for line in utils.read_lines(index_path):
+    date, ticker = line.split(' ')
+    assert len(rows) < len(scores), 'Too few predictions for fold %d' % k
+    rows.append((date, scores[len(rows)], returns[(date, ticker)]))
+  assert len(rows) == len(scores), 'Too many predictions for fold %d' % k
+  return rows
+
+def mean(values):
+  return sum(values) / len(values)
+
+# Returns the Pearson correlation of xs and ys, or None if either is constant.
+def correlation(xs, ys):
+  mx, my = mean(xs), mean(ys)
+  sxy = sum([(x - mx) * (y - my) for x, y in zip(xs, ys)])
+  sxx = sum([(x - mx) ** 2 for x in xs])
+  syy = sum([(y - my) ** 2 for y in ys])
+  if sxx <= 0 or syy <= 0: return None
+  return sxy / sqrt(sxx * syy)
+
+# Takes lists of returns grouped by tied scores, in the order of selection,
+# and returns (weight, return) pairs of k positions.  The group at the
+# boundary shares the remaining weight, so the order within groups does not
+# matter.
+def select(groups, k):
+  positions = []
+  left = k
+  for group in groups:
+    if left <= 0: break
+    weight = min(1.0, float(left) / len(group))
+    for r in group: positions.append((weight, r))
+    left -= len(group)
+  return positions
+
+def weighted_mean(positions):
+  return (sum([w * r for w, r in positions])
+          / sum([w for w, r in positions]))
+
+# Returns a dict of the metrics of one month from its (score, return) pairs,
+# or None if there are fewer than two pairs.
+def evaluate_month(pairs, quantile):
+  n = len(pairs)
+  if n < 2: return None
+  groups = dict()
+  for s, r in pairs:
+    groups.setdefault(s, []).append(r)
+  groups = [groups[s] for s in sorted(groups.keys())]
+  k = max(1, int(n * quantile))
+  longs = select(reversed(groups), k)
+  shorts = select(groups, k)
+  hits = (sum([w for w, r in longs if r > 0])
+          + sum([w for w, r in shorts if r < 0]))
+  return {
+      'n': n,
+      'long': weighted_mean(longs),
+      'short': weighted_mean(shorts),
+      'long_short': weighted_mean(longs) - weighted_mean(shorts),
+      'hit': hits / (2.0 * k),
+      'ic': correlation(utils.compute_ranks([s for s, r in pairs]),
+                        utils.compute_ranks([r for s, r in pairs])),
+  }
+
+# Groups rows of (date, score, return) by date and returns a list of
+# (date, metrics) in ascending order of dates.
+def evaluate(rows, quantile):
+  groups = dict()
+  for date, score, ret in rows:
+    groups.setdefault(date, []).append((score, ret))
+  results = []
+  cum = 1.0
+  for date in sorted(groups.keys()):
+    metrics = evaluate_month(groups[date], quantile)
+    if metrics is None:
+      logging.debug('Skipping %s with too few tickers' % date)
+      continue
+    cum *= 1.0 + metrics['long_short']
+    metrics['cum_long_short'] = cum - 1.0
+    results.append((date, metrics))
+  return results
+
+def summarize(name, results):
+  if len(results) == 0:
+    logging.warning('%s: no months to evaluate' % name)
+    return
+  ls = [metrics['long_short'] for date, metrics in results]
+  ics = [metrics['ic'] for date, metrics in results
+         if metrics['ic'] is not None]
+  ls_mean = mean(ls)
+  ls_std = sqrt(mean([(x - ls_mean) ** 2 for x in ls]))
+  logging.info('%s: %d months, long_short: %.4f (std %.4f), hit: %.4f, '
+               'ic: %.4f, cum_long_short: %.4f'
+               % (name, len(results), ls_mean, ls_std,
+                  mean([metrics['hit'] for date, metrics in results]),
+                  mean(ics) if len(ics) > 0 else 0.0,
+                  results[-1][1]['cum_long_short']))
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--raw_data_path', required=True)
+  parser.add_argument('--cv_dir', required=True)
+  parser.add_argument('--prediction_dir')
+  parser.add_argument('--folds', required=True)
+  parser.add_argument('--quantile', default=QUANTILE, type=float)
+  parser.add_argument('--output_path', required=True)
+  parser.add_argument('--verbose', action='store_true')
+  args = parser.parse_args()
+
+  utils.setup_logging(args.verbose)
+  folds = int(args.folds)
+  assert folds > 1
+  assert args.quantile > 0 and args.quantile <= 0.5
+  prediction_dir = args.prediction_dir
+  if prediction_dir is None: prediction_dir = args.cv_dir
+
+  returns = read_returns(args.raw_data_path)
+  logging.info('Read %d returns' % len(returns))
+
+  rows = []
+  for k in range(folds):
+    fold_rows = read_fold(args.cv_dir, prediction_dir, k, returns)
+    logging.info('Read %d predictions for fold %d' % (len(fold_rows), k+1))
+    summarize('Fold %d' % (k+1), evaluate(fold_rows, args.quantile))
+    rows.extend(fold_rows)
+
+  results = evaluate(rows, args.quantile)
+  summarize('All folds', results)
+  with utils.open_file(args.output_path, 'w') as fp:
+    for date, metrics in results:
+      items = [date, 'n:%d' % metrics['n']]
+      for key in ('long', 'short', 'long_short', 'cum_long_short', 'hit'):
+        items.append('%s:%.4f' % (key, metrics[key]))
+      if metrics['ic'] is not None:
+        items.append('ic:%.4f' % metrics['ic'])
+      print(' '.join(items), file=fp)
+
+if __name__ == '__main__':
+  main()
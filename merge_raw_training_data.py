@@ -0,0 +1,75 @@
+#!/usr/local/bin/python3
+
+""" Merges the shards of raw training data written by
+    create_raw_training_data.py --shard=i/n into the file that an unsharded
+    run would have produced.
+
+    --output_path and --shards should be the same as the --output_path (or
+    the output_path in --dataset_file) and the n of --shard used to create
+    the shards.  The shards are found at utils.shard_path(output_path, shard).
+
+    Lines of each shard are grouped by ticker in the order of --ticker_file,
+    so the shards are merged by that order without loading them in memory.
+"""
+
+import argparse
+import heapq
+import logging
+import utils
+from os import path
+
+# Yields (ticker index, shard, line) for each line of shard.
+def read_shard(shard_path, shard, ticker_index):
+  prev = -1
+  for line in utils.read_lines(shard_path):
+    ticker = line[:line.find(' ')]
+    assert ticker in ticker_index, 'Unknown ticker %s in %s' % (ticker,
+                                                                shard_path)
+    index = ticker_index[ticker]
+    assert index >= prev, 'Out of order ticker %s in %s' % (ticker,
+                                                            shard_path)
+    prev = index
+    yield index, shard, line
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--ticker_file', required=True)
+  parser.add_argument('--output_path', required=True)
+  parser.add_argument('--shards', required=True)
+  parser.add_argument('--verbose', action='store_true')
+  args = parser.parse_args()
+
+  utils.setup_logging(args.verbose)
+  shards = int(args.shards)
+  # With one shard, utils.shard_path() is the output path itself, which
+  # would be truncated before it is read.
+  assert shards > 1, 'Nothing to merge for --shards=%d' % shards
+
+  tickers = utils.read_tickers(args.ticker_file)
+  ticker_index = dict()
+  for i in range(len(tickers)):
+    ticker_index[tickers[i]] = i
+
+  shard_paths = []
+  for i in range(shards):
+    shard_path = utils.shard_path(args.output_path, (i, shards))
+    assert path.isfile(shard_path), 'Shard is missing: %s' % shard_path
+    assert shard_path != args.output_path
+    shard_paths.append(shard_path)
+  logging.info('Merging %d shards' % len(shard_paths))
+
+  # Every ticker must come from a single shard.
+  ticker_shard = dict()
+  count = 0
+  with utils.open_file(args.output_path, 'w') as fp:
+    for index, shard, line in heapq.merge(
+        *[read_shard(shard_paths[i], i, ticker_index)
+          for i in range(len(shard_paths))]):
+      assert ticker_shard.setdefault(index, shard) == shard, (
+          'Ticker %s is in multiple shards' % tickers[index])
+      print(line, file=fp)
+      count += 1
+  logging.info('Merged %d lines' % count)
+
+if __name__ == '__main__':
+  main()
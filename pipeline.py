@@ -0,0 +1,176 @@
+#!/usr/local/bin/python3
+
+""" Chains sample_data.py, compute_features.py, compute_labels.py,
+    create_raw_training_data.py and split_data_for_cv.py in process, passing
+    samples, features, labels and rows in memory instead of through files.
+
+    The stages are generators that can be chained, eg:
+    market_samples = utils.read_samples('GSPC.csv')
+    rows = pipeline.generate_rows(
+        pipeline.compute_maps(pipeline.load_samples(tickers, price_dir),
+                              market_samples, [1, 12], [1], [1]),
+        ['er1', 'er12', 'ev1'], '1')
+    for train_rows, test_rows in split_data_for_cv.split(rows, 10):
+      ...
+    Values in memory have the same precision as the files, so the results
+    are the same as running the scripts one by one.
+
+    As a script, only the files of the requested flags are written, eg,
+    --feature_dir to also write the features, or --cv_dir to write the folds
+    instead of (or in addition to) --output_path.
+    If --er_months, --ev_months or --months is not specified, only the months
+    needed by --features and --label are computed.
+"""
+
+import argparse
+import compute_features
+import compute_labels
+import create_raw_training_data
+import logging
+import sample_data
+import split_data_for_cv
+import utils
+
+# Yields (ticker, stock_samples) for each ticker having a price file in
+# price_dir, where stock_samples is like utils.read_samples().
+def load_samples(tickers, price_dir):
+  for i in range(len(tickers)):
+    ticker = tickers[i]
+    assert ticker.find('^') == -1  # ^GSPC should not be in tickers.
+    logging.info('%d/%d: %s' % (i+1, len(tickers), ticker))
+    price_path = utils.find_file('%s/%s.csv' % (price_dir, ticker))
+    if price_path is None:
+      logging.warning('Input file is missing for %s' % ticker)
+      continue
+    samples = sample_data.compute_samples(utils.read_lines(price_path))
+    yield ticker, utils.make_sample_map(samples)
+
+# Takes the output of load_samples() and yields (ticker, stock_samples,
+# feature_map, label_map) for each ticker.
+def compute_maps(ticker_samples, market_samples, er_months, ev_months,
+                 months):
+  for ticker, stock_samples in ticker_samples:
+    feature_map = compute_features.compute_feature_map(
+        stock_samples, market_samples, er_months, ev_months)
+    label_map = compute_labels.compute_label_map(
+        stock_samples, market_samples, months)
+    yield ticker, stock_samples, feature_map, label_map
+
+# Takes the output of compute_maps() and yields the rows of raw training data
+# like create_raw_training_data.generate_rows().
+def generate_rows(ticker_maps, features, label,
+                  min_date=create_raw_training_data.MIN_DATE,
+                  max_date=create_raw_training_data.MAX_DATE):
+  for ticker, stock_samples, feature_map, label_map in ticker_maps:
+    for row in create_raw_training_data.generate_rows(
+        ticker, feature_map, label_map, features, label, min_date, max_date):
+      yield row
+
+# Returns the months of the features with the prefix, eg, [1, 12] for
+# prefix 'er' and features ['er1', 'ev1', 'er12'].
+def feature_months(features, prefix):
+  months = []
+  for f in features:
+    assert f[:2] in ('er', 'ev') and f[2:].isdigit(), 'Bad feature: %s' % f
+    if f[:2] == prefix: months.append(int(f[2:]))
+  return months
+
+# Writes stock samples like sample_data.py.
+def write_samples(stock_samples, output_path):
+  with utils.open_file(output_path, 'w') as fp:
+    for date in sorted(stock_samples.keys(), reverse=True):
+      price, volume = stock_samples[date]
+      sample_data.print_sample((date, volume, price), fp)
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--ticker_file', required=True)
+  parser.add_argument('--shard', default='0/1')
+  parser.add_argument('--price_dir', required=True)
+  parser.add_argument('--market_sample_path', required=True)
+  parser.add_argument('--er_months')
+  parser.add_argument('--ev_months')
+  parser.add_argument('--months')
+  parser.add_argument('--features', default=create_raw_training_data.FEATURES)
+  parser.add_argument('--label', default=create_raw_training_data.LABEL)
+  parser.add_argument('--min_date', default=create_raw_training_data.MIN_DATE)
+  parser.add_argument('--max_date', default=create_raw_training_data.MAX_DATE)
+  parser.add_argument('--regression', action='store_true')
+  parser.add_argument('--sample_dir')
+  parser.add_argument('--feature_dir')
+  parser.add_argument('--label_dir')
+  parser.add_argument('--output_path')
+  parser.add_argument('--cv_dir')
+  parser.add_argument('--folds')
+  parser.add_argument('--compression', default='none',
+                      choices=utils.COMPRESSIONS)
+  parser.add_argument('--verbose', action='store_true')
+  args = parser.parse_args()
+
+  # Something must be written.
+  assert (args.sample_dir is not None or args.feature_dir is not None
+          or args.label_dir is not None or args.output_path is not None
+          or args.cv_dir is not None)
+  assert (args.cv_dir is None) == (args.folds is None)
+
+  utils.setup_logging(args.verbose)
+  shard = utils.parse_shard(args.shard)
+  # Folds need the rows of all tickers.
+  assert args.cv_dir is None or shard[1] == 1
+
+  features = args.features.split(',')
+  if args.er_months is None: er_months = feature_months(features, 'er')
+  else: er_months = [int(m) for m in args.er_months.split(',')]
+  if args.ev_months is None: ev_months = feature_months(features, 'ev')
+  else: ev_months = [int(m) for m in args.ev_months.split(',')]
+  if args.months is None: months = [int(args.label)]
+  else: months = [int(m) for m in args.months.split(',')]
+
+  market_samples = utils.read_samples(args.market_sample_path)
+
+  # Tickers are listed one per line.
+  tickers = utils.read_tickers(args.ticker_file, shard)
+  logging.info('Processing %d tickers' % len(tickers))
+
+  # Intermediate files are always overwritten.
+  def output_path(output_dir, ticker, ext):
+    return utils.prepare_output('%s/%s.%s' % (output_dir, ticker, ext),
+                                args.compression, True)
+
+  # Intermediate files are written as the tickers go through the stages.
+  def ticker_maps():
+    for ticker, stock_samples, feature_map, label_map in compute_maps(
+        load_samples(tickers, args.price_dir), market_samples, er_months,
+        ev_months, months):
+      if args.sample_dir is not None:
+        write_samples(stock_samples, output_path(args.sample_dir, ticker,
+                                                 'csv'))
+      if args.feature_dir is not None:
+        utils.write_data(feature_map, output_path(args.feature_dir, ticker,
+                                                  'txt'))
+      if args.label_dir is not None:
+        utils.write_data(label_map, output_path(args.label_dir, ticker, 'txt'))
+      yield ticker, stock_samples, feature_map, label_map
+
+  rows = generate_rows(ticker_maps(), features, args.label, args.min_date,
+                       args.max_date)
+  if args.cv_dir is not None: rows = list(rows)
+  if args.output_path is not None:
+    count = 0
+    with utils.open_file(utils.shard_path(args.output_path, shard),
+                         'w') as fp:
+      for row in rows:
+        print(create_raw_training_data.format_row(row, args.regression),
+              file=fp)
+        count += 1
+    logging.info('%d data points' % count)
+  else:
+    # Drain the rows for the intermediate files.
+    for row in rows: pass
+  if args.cv_dir is not None:
+    split_data_for_cv.write_folds(split_data_for_cv.format_features(rows),
+                                  int(args.folds), args.cv_dir,
+                                  args.compression)
+
+if __name__ == '__main__':
+  main()
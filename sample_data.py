@@ -8,7 +8,6 @@
 import argparse
 import logging
 import utils
-from os import path
 
 def print_sample(sample, fp):
   print('%s %.2f %.2f' % (sample[0], sample[1], sample[2]), file=fp)
@@ -27,40 +26,54 @@ def next(ym):
   assert m == 12
   return '%04d-%02d' % (y+1, 1)
 
-def sample(input_path, output_path):
-  with open(input_path, 'r') as fp:
-    lines = fp.read().splitlines()
+# Takes the lines of a price file (including the header), and returns a list
+# of (date, volume, price) for each month in descending order, with the same
+# precision as the sample files.
+def compute_samples(lines):
   samples = []
   pd, pv, pa = None, None, None
-  for i in range(1, len(lines)):
-    if lines[i].startswith('#'):
-      logging.warning('Skipping line: %s' % lines[i])
+  header = True
+  for line in lines:
+    if header:
+      header = False
+      continue
+    if line.startswith('#'):
+      logging.warning('Skipping line: %s' % line)
       continue
-    d, o, h, l, c, v, a = lines[i].split(',')
+    d, o, h, l, c, v, a = line.split(',')
     m = d[5:7]
     if pd is not None and pd[5:7] != m:
       samples.append((pd[:7], float(pv), float(pa)))
     pd, pv, pa = d, v, a
   samples.append((d[:7], float(v), float(a)))  # Last month.
-  with open(output_path, 'w') as fp:
-    print_sample(samples[0], fp)
-    for i in range(1, len(samples)):
-      d = distance(samples[i-1][0], samples[i][0])
-      assert d >= 1 and d <= 2
-      if d == 2:
-        logging.warning('Inserting sample between %s and %s'
-                        % (samples[i-1][0], samples[i][0]))
-        print_sample((next(samples[i][0]),
-                      (samples[i][1] + samples[i-1][1]) * 0.5,
-                      (samples[i][2] + samples[i-1][2]) * 0.5), fp)
-      print_sample(samples[i], fp)
+  filled = [samples[0]]
+  for i in range(1, len(samples)):
+    d = distance(samples[i-1][0], samples[i][0])
+    assert d >= 1 and d <= 2
+    if d == 2:
+      logging.warning('Inserting sample between %s and %s'
+                      % (samples[i-1][0], samples[i][0]))
+      filled.append((next(samples[i][0]),
+                     (samples[i][1] + samples[i-1][1]) * 0.5,
+                     (samples[i][2] + samples[i-1][2]) * 0.5))
+    filled.append(samples[i])
+  return [(s[0], round(s[1], 2), round(s[2], 2)) for s in filled]
+
+def sample(input_path, output_path):
+  samples = compute_samples(utils.read_lines(input_path))
+  with utils.open_file(output_path, 'w') as fp:
+    for s in samples:
+      print_sample(s, fp)
 
 def main():
   parser = argparse.ArgumentParser()
   parser.add_argument('--ticker_file', required=True)
+  parser.add_argument('--shard', default='0/1')
   parser.add_argument('--input_dir', required=True)
   parser.add_argument('--output_dir', required=True)
   parser.add_argument('--overwrite', action='store_true')
+  parser.add_argument('--compression', default='none',
+                      choices=utils.COMPRESSIONS)
   parser.add_argument('--verbose', action='store_true')
   args = parser.parse_args()
 
@@ -70,22 +83,21 @@ def main():
   utils.setup_logging(args.verbose)
 
   # Tickers are listed one per line.
-  with open(args.ticker_file, 'r') as fp:
-    tickers = fp.read().splitlines()
+  tickers = utils.read_tickers(args.ticker_file, utils.parse_shard(args.shard))
   logging.info('Processing %d tickers' % len(tickers))
 
   for i in range(len(tickers)):
     ticker = tickers[i]
     logging.info('%d/%d: %s' % (i+1, len(tickers), ticker))
-    input_path = '%s/%s.csv' % (args.input_dir, ticker.replace('^', '_'))
-    if not path.isfile(input_path):
-      logging.warning('Input file is missing: %s' % input_path)
-      continue
-    output_path = '%s/%s.csv' % (args.output_dir, ticker.replace('^', '_'))
-    if path.isfile(output_path) and not args.overwrite:
-      logging.warning('Output file exists and not overwritable: %s'
-                      % output_path)
+    input_path = utils.find_file(
+        '%s/%s.csv' % (args.input_dir, ticker.replace('^', '_')))
+    if input_path is None:
+      logging.warning('Input file is missing for %s' % ticker)
       continue
+    output_path = utils.prepare_output(
+        '%s/%s.csv' % (args.output_dir, ticker.replace('^', '_')),
+        args.compression, args.overwrite)
+    if output_path is None: continue
     sample(input_path, output_path)
 
 if __name__ == '__main__':
@@ -2,7 +2,8 @@
 
 """ Splits libsvm training data for cross validation.  The input should be
     raw training data (with real excess returns as labels instead of +/-1),
-    and the output files will be compatible with libsvm.
+    and the output files will be compatible with libsvm (unless compressed
+    with --compression).
 
     The way we split data is to sort all entries by date and then by ticker
     name, and split them into k equal segments.  For fold i, the training data
@@ -15,14 +16,81 @@ import argparse
 import logging
 import utils
 
-def close_all(fps):
-  for fp in fps: fp.close()
+# Returns the (start, end) of the testing segment of each fold, for count
+# entries sorted by date and then ticker.
+def compute_segments(count, folds):
+  segment = int(count / folds)
+  segments = []
+  for i in range(folds):
+    start = segment * i
+    end = start + segment
+    if i == folds - 1: end = count
+    segments.append((start, end))
+  return segments
+
+# Parses a line of raw training data into a row of (ticker, date, label,
+# features), where only the label is parsed and features is the text of the
+# features as is.
+def parse_line(line):
+  items = line.split(' ', 3)
+  assert len(items) > 3
+  return items[0], items[1], float(items[2]), items[3]
+
+# Takes rows of (ticker, date, label, values) like
+# create_raw_training_data.generate_rows(), and yields rows of (ticker, date,
+# label, features) like parse_line().
+def format_features(rows):
+  for ticker, date, label, values in rows:
+    yield ticker, date, label, ' '.join(utils.format_values(values))
+
+# Sorts rows by date and then ticker.
+def sort_rows(rows):
+  return sorted(rows, key=lambda row: (row[1], row[0]))
+
+# Takes rows of (ticker, date, label, ...), eg, from
+# create_raw_training_data.generate_rows() or parse_line(), and yields
+# (training rows, testing rows) for each fold.
+def split(rows, folds):
+  assert folds > 1
+  rows = sort_rows(rows)
+  for start, end in compute_segments(len(rows), folds):
+    yield rows[:start] + rows[end:], rows[start:end]
+
+# Returns the lines of the data and index files for a row like parse_line().
+def format_row(row):
+  ticker, date, label, features = row
+  return ('%s %s' % (utils.make_label(label, False), features),
+          '%s %s' % (date, ticker))
+
+# Writes rows like parse_line() to the data and index files of the given paths.
+def write_rows(rows, data_path, index_path):
+  with utils.open_file(data_path, 'w') as data_fp:
+    with utils.open_file(index_path, 'w') as index_fp:
+      for row in rows:
+        data, index = format_row(row)
+        print(data, file=data_fp)
+        print(index, file=index_fp)
+
+# Writes a training data file, a training index file, a testing data file,
+# and a testing index file for each fold of rows like parse_line().
+def write_folds(rows, folds, output_dir, compression):
+  for k, (train_rows, test_rows) in enumerate(split(rows, folds)):
+    logging.info('Writing fold %d' % (k+1))
+    for name, fold_rows in (('train', train_rows), ('test', test_rows)):
+      data_path = '%s/%s_data_%d' % (output_dir, name, k)
+      index_path = '%s/%s_index_%d' % (output_dir, name, k)
+      utils.remove_file(data_path)
+      utils.remove_file(index_path)
+      write_rows(fold_rows, utils.compressed_path(data_path, compression),
+                 utils.compressed_path(index_path, compression))
 
 def main():
   parser = argparse.ArgumentParser()
   parser.add_argument('--input_path', required=True)
   parser.add_argument('--output_dir', required=True)
   parser.add_argument('--folds', required=True)
+  parser.add_argument('--compression', default='none',
+                      choices=utils.COMPRESSIONS)
   parser.add_argument('--verbose', action='store_true')
   args = parser.parse_args()
 
@@ -30,63 +98,10 @@ def main():
   folds = int(args.folds)
   assert folds > 1
 
-  with open(args.input_path, 'r') as fp:
-    lines = fp.read().splitlines()
-  # Swap date and ticker in place.
-  item_count = -1
-  for i in range(len(lines)):
-    items = lines[i].split(' ')
-    if item_count < 0: item_count = len(items)
-    else: assert item_count == len(items)
-    items[0], items[1] = items[1], items[0]
-    lines[i] = ' '.join(items)
-  # This will sort lines by entry and then ticker.
-  lines.sort()
-
-  # Prepare all the file handlers.  We are going to write to folds * 4 files,
-  # with each fold a training data file, a training index file, a testing
-  # data file, and a testing index file.
-  train_data_fps, train_index_fps = [], []
-  test_data_fps, test_index_fps = [], []
-  for i in range(folds):
-    train_data_fps.append(open('%s/train_data_%d' % (args.output_dir, i), 'w'))
-    train_index_fps.append(open('%s/train_index_%d' % (args.output_dir, i),
-                                'w'))
-    test_data_fps.append(open('%s/test_data_%d' % (args.output_dir, i), 'w'))
-    test_index_fps.append(open('%s/test_index_%d' % (args.output_dir, i), 'w'))
-  # Sanity checks.
-  assert len(train_data_fps) == folds
-  assert len(train_index_fps) == folds
-  assert len(test_data_fps) == folds
-  assert len(test_index_fps) == folds
-
-  segment = int(len(lines) / folds)
-  for i in range(folds):
-    logging.info('Writing fold %d' % (i+1))
-    start = segment * i
-    end = start + segment
-    if i == folds - 1: end = len(lines)
-    for j in range(start, end):
-      items = lines[j].split(' ')
-      # Write label, features to data files and date, ticker to index files.
-      assert len(items) > 3
-      data = '%s %s' % (utils.make_label(float(items[2]), False),
-                        ' '.join(items[3:]))
-      index = ' '.join(items[:2])
-      for k in range(folds):
-        if i != k:
-          print(data, file=train_data_fps[k])
-          print(index, file=train_index_fps[k])
-        else:
-          print(data, file=test_data_fps[k])
-          print(index, file=test_index_fps[k])
-
-  # Close all file handlers.
-  close_all(train_data_fps)
-  close_all(train_index_fps)
-  close_all(test_data_fps)
-  close_all(test_index_fps)
+  rows = [parse_line(line) for line in utils.read_lines(args.input_path)]
+  # All rows must have the same number of features.
+  for row in rows: assert row[3].count(' ') == rows[0][3].count(' ')
+  write_folds(rows, folds, args.output_dir, args.compression)
 
 if __name__ == '__main__':
   main()
-
@@ -3,23 +3,121 @@
 """ Utilities shared by other scripts.
 """
 
+import bz2
+import gzip
 import logging
-from os import environ
+import lzma
+from os import environ, path, remove
 from time import tzset
 
 MIN_CAP = -1.0
 MAX_CAP = 1.0
 
-def read_samples(file_path):
-  with open(file_path, 'r') as fp:
-    lines = fp.read().splitlines()
+# Maps --compression flag values to file name suffixes.  Files are
+# (de)compressed transparently based on their suffixes.
+COMPRESSION_SUFFIXES = {'none': '', 'gzip': '.gz', 'xz': '.xz', 'bz2': '.bz2'}
+COMPRESSIONS = sorted(COMPRESSION_SUFFIXES.keys())
+
+# Opens file_path in text mode.  Compressed files are detected by suffix.
+def open_file(file_path, mode='r'):
+  assert mode in ('r', 'w', 'a')
+  if file_path.endswith('.gz'): return gzip.open(file_path, mode + 't')
+  if file_path.endswith('.xz'): return lzma.open(file_path, mode + 't')
+  if file_path.endswith('.bz2'): return bz2.open(file_path, mode + 't')
+  return open(file_path, mode)
+
+# Yields lines of file_path one at a time, with line breaks stripped.
+def read_lines(file_path):
+  with open_file(file_path, 'r') as fp:
+    for line in fp:
+      yield line.rstrip('\r\n')
+
+# Returns file_path or its compressed variant, whichever exists, or None if
+# none of them exists.  Fails if more than one of them exists, since there is
+# no telling which one is stale.
+def find_file(file_path):
+  paths = [file_path + suffix for suffix in COMPRESSION_SUFFIXES.values()
+           if path.isfile(file_path + suffix)]
+  assert len(paths) <= 1, 'Multiple variants exist: %s' % paths
+  if len(paths) == 0: return None
+  return paths[0]
+
+# Returns file_path with the suffix of compression appended.
+def compressed_path(file_path, compression):
+  return file_path + COMPRESSION_SUFFIXES[compression]
+
+# Removes file_path or its compressed variant, if any, such that a new output
+# in another compression will not sit next to a stale one.
+def remove_file(file_path):
+  existing_path = find_file(file_path)
+  if existing_path is not None: remove(existing_path)
+
+# Returns the path to write file_path in compression, or None if file_path
+# exists in any compression and overwrite is not set.  When overwriting, the
+# existing file is removed first.
+def prepare_output(file_path, compression, overwrite):
+  existing_path = find_file(file_path)
+  if existing_path is not None:
+    if not overwrite:
+      logging.warning('Output file exists: %s, skipping' % existing_path)
+      return None
+    remove(existing_path)
+  return compressed_path(file_path, compression)
+
+# Parses a --shard flag value 'i/n' into (i, n), where 0 <= i < n.
+def parse_shard(shard):
+  i, n = shard.split('/')
+  i, n = int(i), int(n)
+  assert n > 0 and i >= 0 and i < n, 'Bad shard: %s' % shard
+  return i, n
+
+# Reads tickers listed one per line in file_path.  If shard (i, n) is
+# specified, the tickers are partitioned into n contiguous ranges of (almost)
+# equal size and only the i-th range is returned.  The partition only
+# depends on the ticker file, so it is stable across machines.
+def read_tickers(file_path, shard=None):
+  tickers = list(read_lines(file_path))
+  if shard is None: return tickers
+  i, n = shard
+  return tickers[len(tickers) * i // n : len(tickers) * (i+1) // n]
+
+# Returns the path of shard (i, n) of the output file_path, eg, raw.1-of-4.gz
+# for raw.gz.  The compression suffix, if any, is kept at the end.
+def shard_path(file_path, shard):
+  i, n = shard
+  if n == 1: return file_path
+  suffix = ''
+  for s in COMPRESSION_SUFFIXES.values():
+    if s != '' and file_path.endswith(s):
+      file_path, suffix = file_path[:-len(s)], s
+      break
+  return '%s.%d-of-%d%s' % (file_path, i, n, suffix)
+
+# Takes a list of (date, volume, price) like the lines of a sample file, and
+# returns a dict mapping date to (price, volume).
+def make_sample_map(samples):
   d = dict()
-  for line in lines:
-    dt, vo, pr = line.split(' ')
-    vo, pr = float(vo), float(pr)
+  for dt, vo, pr in samples:
     d[dt] = (pr, vo)  # The order is switched as we will output er before ev.
   return d
 
+def read_samples(file_path):
+  samples = []
+  for line in read_lines(file_path):
+    dt, vo, pr = line.split(' ')
+    samples.append((dt, float(vo), float(pr)))
+  return make_sample_map(samples)
+
+# Writes a dict mapping date to a dict of key/value pairs, one date per line
+# in descending order, eg: 2013-08 er1:0.1000 ev1:-0.1000
+def write_data(data, file_path):
+  with open_file(file_path, 'w') as fp:
+    for date in sorted(data.keys(), reverse=True):
+      items = [date]
+      for k, v in data[date].items():
+        items.append('%s:%.4f' % (k, v))
+      print(' '.join(items), file=fp)
+
 def compute_excess(stock_from, stock_to, market_from, market_to,
                    bonus, min_cap=MIN_CAP, max_cap=MAX_CAP):
   assert stock_from >= 0
@@ -34,6 +132,25 @@ def compute_excess(stock_from, stock_to, market_from, market_to,
   if excess < min_cap: return min_cap
   return excess
 
+# Returns the ranks of values (1-based, ties taking the average rank).
+def compute_ranks(values):
+  order = sorted(range(len(values)), key=lambda i: values[i])
+  ranks = [0.0] * len(values)
+  i = 0
+  while i < len(order):
+    j = i
+    while j + 1 < len(order) and values[order[j+1]] == values[order[i]]:
+      j += 1
+    rank = (i + j) * 0.5 + 1
+    for k in range(i, j+1):
+      ranks[order[k]] = rank
+    i = j + 1
+  return ranks
+
+# Returns the libsvm items of feature values, eg, ['1:0.100000', '2:0.2'].
+def format_values(values):
+  return ['%d:%f' % (i+1, values[i]) for i in range(len(values))]
+
 def make_label(label, regression):
   if regression: return str(label)
   if label > 0: return '+1'
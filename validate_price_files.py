@@ -6,22 +6,19 @@
 import argparse
 import logging
 import utils
-from os import path
 
 def bad(i):
   return 'Detected bad line at %d' % (i+1)
 
 def validate(input_path):
-  with open(input_path, 'r') as fp:
-    lines = fp.read().splitlines()
-  assert len(lines) > 0
-  assert lines[0] == 'Date,Open,High,Low,Close,Volume,Adj Close'
+  lines = utils.read_lines(input_path)
+  assert next(lines, None) == 'Date,Open,High,Low,Close,Volume,Adj Close'
   pd = None
-  for i in range(1, len(lines)):
-    if lines[i].startswith('#'):
-      logging.warning('Line %d is commented out: %s' % (i+1, lines[i]))
+  for i, line in enumerate(lines, 1):
+    if line.startswith('#'):
+      logging.warning('Line %d is commented out: %s' % (i+1, line))
       continue
-    d, o, h, l, c, v, a = lines[i].split(',')
+    d, o, h, l, c, v, a = line.split(',')
     if pd is None: pd = d
     else:
       assert pd > d, bad(i)
@@ -60,6 +57,7 @@ def validate(input_path):
 def main():
   parser = argparse.ArgumentParser()
   parser.add_argument('--ticker_file', required=True)
+  parser.add_argument('--shard', default='0/1')
   parser.add_argument('--input_dir', required=True)
   parser.add_argument('--from_ticker', default='')
   parser.add_argument('--verbose', action='store_true')
@@ -68,10 +66,9 @@ def main():
   utils.setup_logging(args.verbose)
 
   # Tickers are listed one per line.
-  with open(args.ticker_file, 'r') as fp:
-    lines = fp.read().splitlines()
   tickers = []
-  for line in lines:
+  for line in utils.read_tickers(args.ticker_file,
+                                 utils.parse_shard(args.shard)):
     if line >= args.from_ticker:
       tickers.append(line)
   logging.info('Processing %d tickers' % len(tickers))
@@ -79,9 +76,10 @@ def main():
   for i in range(len(tickers)):
     ticker = tickers[i]
     logging.info('%d/%d: %s' % (i+1, len(tickers), ticker))
-    input_path = '%s/%s.csv' % (args.input_dir, ticker.replace('^', '_'))
-    if not path.isfile(input_path):
-      logging.warning('Input file does not exist: %s' % input_path)
+    input_path = utils.find_file(
+        '%s/%s.csv' % (args.input_dir, ticker.replace('^', '_')))
+    if input_path is None:
+      logging.warning('Input file does not exist for %s' % ticker)
       continue
     validate(input_path)
 
@@ -6,7 +6,6 @@
 import argparse
 import logging
 import utils
-from os import path
 
 def distance(ym1, ym2):
   y1, m1 = ym1.split('-')
@@ -19,15 +18,15 @@ def bad(i):
   return 'Detected bad line at %d' % (i+1)
 
 def validate(input_path):
-  with open(input_path, 'r') as fp:
-    lines = fp.read().splitlines()
-  assert len(lines) > 0
-  pd, pv, pp = lines[0].split(' ')
+  lines = utils.read_lines(input_path)
+  first = next(lines, None)
+  assert first is not None
+  pd, pv, pp = first.split(' ')
   pv, pp = float(pv), float(pp)
   assert pv >= 0
   assert pp >= 0
-  for i in range(1, len(lines)):
-    cd, cv, cp = lines[i].split(' ')
+  for line in lines:
+    cd, cv, cp = line.split(' ')
     assert distance(pd, cd) == 1
     cv, cp = float(cv), float(cp)
     assert cv >= 0
@@ -37,6 +36,7 @@ def validate(input_path):
 def main():
   parser = argparse.ArgumentParser()
   parser.add_argument('--ticker_file', required=True)
+  parser.add_argument('--shard', default='0/1')
   parser.add_argument('--input_dir', required=True)
   parser.add_argument('--from_ticker', default='')
   parser.add_argument('--verbose', action='store_true')
@@ -45,10 +45,9 @@ def main():
   utils.setup_logging(args.verbose)
 
   # Tickers are listed one per line.
-  with open(args.ticker_file, 'r') as fp:
-    lines = fp.read().splitlines()
   tickers = []
-  for line in lines:
+  for line in utils.read_tickers(args.ticker_file,
+                                 utils.parse_shard(args.shard)):
     if line >= args.from_ticker:
       tickers.append(line)
   logging.info('Processing %d tickers' % len(tickers))
@@ -56,9 +55,10 @@ def main():
   for i in range(len(tickers)):
     ticker = tickers[i]
     logging.info('%d/%d: %s' % (i+1, len(tickers), ticker))
-    input_path = '%s/%s.csv' % (args.input_dir, ticker.replace('^', '_'))
-    if not path.isfile(input_path):
-      logging.warning('Input file does not exist: %s' % input_path)
+    input_path = utils.find_file(
+        '%s/%s.csv' % (args.input_dir, ticker.replace('^', '_')))
+    if input_path is None:
+      logging.warning('Input file does not exist for %s' % ticker)
       continue
     validate(input_path)
 